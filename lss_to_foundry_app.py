@@ -13,6 +13,8 @@ from pathlib import Path
 from typing import Dict, Any
 import io
 import base64
+import hashlib
+import reprlib
 from PIL import Image
 
 # Конфигурация страницы
@@ -354,6 +356,201 @@ class LSSToFoundryConverterV3:
         return skill_abilities.get(skill_code, 'str')
 
 
+class FoundryActorValidator:
+    """Валидатор структуры актёра dnd5e и его прототипа токена.
+
+    Схема один раз компилируется в дерево функций-проверок, поэтому
+    проверка каждого документа - это только вызовы готовых замыканий.
+    Возвращаются все найденные нарушения, а не только первое.
+    """
+
+    ABILITIES = frozenset(['str', 'dex', 'con', 'int', 'wis', 'cha'])
+    # CONFIG.Canvas.visionModes: ядро Foundry VTT + режимы, которые регистрирует система dnd5e.
+    # Намеренно не выводится из VISION_TYPES, иначе конвертер проверялся бы сам собой.
+    VISION_MODES = frozenset([
+        'basic', 'darkvision', 'monochromatic', 'blindness', 'tremorsense', 'lightAmplification',
+        'blindsight', 'devilsSight', 'etherealness',
+    ])
+    # CONST.TOKEN_DISPLAY_MODES: NONE, CONTROL, OWNER_HOVER, HOVER, OWNER, ALWAYS
+    DISPLAY_MODES = frozenset([0, 10, 20, 30, 40, 50])
+
+    def __init__(self):
+        self._check = self._compile(self._build_schema(), '')
+
+    def validate(self, actor) -> list:
+        """Проверить актёра, вернуть список нарушений (пустой, если всё в порядке)."""
+        errors = []
+        self._check(actor, errors)
+        return errors
+
+    def _build_schema(self):
+        """Схема: dict - вложенный объект, frozenset - допустимые значения, тип/кортеж типов - лист."""
+        number = (int, float)
+        optional_str = (str, type(None))
+
+        ability = {"value": int, "proficient": int}
+        skill = {"value": int, "ability": self.ABILITIES}
+
+        return {
+            "name": str,
+            "type": frozenset(['character']),
+            "img": str,
+            "system": {
+                "abilities": {key: ability for key in self.ABILITIES},
+                "attributes": {
+                    "ac": {"flat": int},
+                    "hp": {"value": int, "max": int, "temp": int, "tempmax": int},
+                    "init": {"bonus": int},
+                    "movement": {"walk": int, "burrow": int, "climb": int, "fly": int, "swim": int},
+                    "prof": int,
+                },
+                "details": {
+                    "alignment": str,
+                    "race": str,
+                    "background": str,
+                    "level": int,
+                    "xp": {"value": int},
+                },
+                "currency": {coin: int for coin in ('pp', 'gp', 'ep', 'sp', 'cp')},
+                "skills": {code: skill for code in LSSToFoundryConverterV3.SKILLS_MAP.values()},
+            },
+            "items": list,
+            "effects": list,
+            "ownership": {"default": int},
+            "prototypeToken": {
+                "name": str,
+                "displayName": self.DISPLAY_MODES,
+                "actorLink": bool,
+                "width": number,
+                "height": number,
+                "texture": {"src": str, "scaleX": number, "scaleY": number},
+                "lockRotation": bool,
+                "disposition": frozenset([-2, -1, 0, 1]),
+                "displayBars": self.DISPLAY_MODES,
+                "bar1": {"attribute": optional_str},
+                "bar2": {"attribute": optional_str},
+                "sight": {
+                    "enabled": bool,
+                    "range": number,
+                    "angle": number,
+                    "visionMode": self.VISION_MODES,
+                },
+                "detectionModes": list,
+            },
+        }
+
+    def _compile(self, spec, path):
+        """Скомпилировать узел схемы в функцию check(value, errors)."""
+        where = path or 'actor'
+
+        if isinstance(spec, dict):
+            children = []
+            for key, sub_spec in spec.items():
+                child_path = f"{path}.{key}" if path else key
+                children.append((key, child_path, self._compile(sub_spec, child_path)))
+
+            def check_object(value, errors):
+                if not isinstance(value, dict):
+                    errors.append(f"{where}: ожидался объект, получено {type(value).__name__}")
+                    return
+                for key, child_path, check in children:
+                    if key in value:
+                        check(value[key], errors)
+                    else:
+                        errors.append(f"{child_path}: отсутствует обязательное поле")
+            return check_object
+
+        if isinstance(spec, frozenset):
+            allowed = ', '.join(sorted(map(str, spec)))
+            # True == 1 и 1.0 == 1, поэтому тип проверяется отдельно от значения
+            choice_types = tuple({type(choice) for choice in spec})
+
+            def check_choice(value, errors):
+                if type(value) not in choice_types or value not in spec:
+                    errors.append(f"{where}: недопустимое значение {reprlib.repr(value)} (ожидалось одно из: {allowed})")
+            return check_choice
+
+        types = spec if isinstance(spec, tuple) else (spec,)
+        # bool - подкласс int, но Foundry не примет True вместо числа
+        reject_bool = bool not in types
+        expected = ' | '.join('null' if t is type(None) else t.__name__ for t in types)
+
+        def check_type(value, errors):
+            if not isinstance(value, types) or (reject_bool and isinstance(value, bool)):
+                errors.append(f"{where}: ожидался {expected}, получено {type(value).__name__} ({reprlib.repr(value)})")
+        return check_type
+
+
+ACTOR_VALIDATOR = FoundryActorValidator()
+
+PREVIEW_SIZE = (120, 120)
+
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def make_image_preview(content_hash: str, _image_bytes: bytes):
+    """Декодировать изображение один раз и вернуть (PNG-миниатюра, метаданные).
+
+    Кэш ключуется только хэшем содержимого: сами байты (параметр с "_")
+    Streamlit не хэширует, поэтому повторные перезапуски берут готовую миниатюру.
+    """
+    with Image.open(io.BytesIO(_image_bytes)) as image:
+        width, height = image.size
+        image_format = image.format or 'unknown'
+        image.draft('RGB', PREVIEW_SIZE)  # для JPEG декодируем сразу в уменьшенном масштабе
+        thumbnail = image.copy()
+
+    # Приводим режим до уменьшения: thumbnail() не работает с I;16, I и т.п.
+    if thumbnail.mode in ('P', 'LA', 'PA'):
+        thumbnail = thumbnail.convert('RGBA')
+    elif thumbnail.mode not in ('RGB', 'RGBA'):
+        thumbnail = thumbnail.convert('RGB')
+    thumbnail.thumbnail(PREVIEW_SIZE)
+
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, format='PNG', optimize=True)
+
+    metadata = {
+        'width': width,
+        'height': height,
+        'format': image_format,
+        'file_size': len(_image_bytes),
+        # Столько займёт base64 в итоговом JSON
+        'encoded_size': 4 * ((len(_image_bytes) + 2) // 3),
+    }
+    return buffer.getvalue(), metadata
+
+
+def format_size(size_bytes):
+    """Человекочитаемый размер файла"""
+    if size_bytes < 1024:
+        return f"{size_bytes} Б"
+    if size_bytes < 1024 * 1024:
+        return f"{size_bytes / 1024:.1f} КБ"
+    return f"{size_bytes / (1024 * 1024):.1f} МБ"
+
+
+def show_image_preview(uploaded_file):
+    """Показать кэшированную миниатюру загруженного изображения и его метаданные.
+
+    Возвращает False, если изображение не удалось декодировать.
+    """
+    image_bytes = uploaded_file.getvalue()
+    content_hash = hashlib.sha256(image_bytes).hexdigest()
+    try:
+        preview_bytes, metadata = make_image_preview(content_hash, image_bytes)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        st.warning(f"⚠️ Не удалось построить предпросмотр ({format_size(len(image_bytes))}): {e}")
+        return False
+
+    st.image(preview_bytes)
+    st.caption(
+        f"{metadata['format']} · {metadata['width']}×{metadata['height']} px · "
+        f"файл {format_size(metadata['file_size'])} · "
+        f"в JSON {format_size(metadata['encoded_size'])}"
+    )
+    return True
+
+
 def main():
     st.title("⚔️ LSS → Foundry VTT D&D 5e Converter v3.0")
     st.markdown("**Конвертация персонажей с портретами и токенами!** 🎨✨")
@@ -423,16 +620,16 @@ def main():
             # Предпросмотр портрета (УМЕНЬШЕННЫЙ)
             if uploaded_portrait:
                 st.markdown("### Предпросмотр портрета:")
-                st.image(uploaded_portrait, width=60, use_column_width=True)
-                st.caption("✅ Портрет готов к импорту")
+                if show_image_preview(uploaded_portrait):
+                    st.caption("✅ Портрет готов к импорту")
 
         with col_tocken:
             
             # Предпросмотр токена (УМЕНЬШЕННЫЙ)
             if uploaded_token:
                 st.markdown("### Предпросмотр токена:")
-                st.image(uploaded_token, width=60, use_column_width=True)
-                st.caption("✅ Токен готов к импорту")
+                if show_image_preview(uploaded_token):
+                    st.caption("✅ Токен готов к импорту")
 
     with col_settings:
         st.header("⚙️ Шаг 2: Настройки")
@@ -621,7 +818,13 @@ def main():
             # Конвертируем
             foundry_actor = converter.create_foundry_actor(lss_data, character_name if character_name else None)
 
-            st.success("✅ Конвертация успешна!")
+            # Проверка структуры до импорта в Foundry
+            violations = ACTOR_VALIDATOR.validate(foundry_actor)
+            if violations:
+                st.warning(f"⚠️ Конвертация завершена, но найдено нарушений структуры: {len(violations)} - Foundry может отклонить импорт")
+                st.code('\n'.join(violations), language=None)
+            else:
+                st.success("✅ Конвертация успешна! Структура актёра и токена прошла проверку")
 
             # Результаты
             result_col1, result_col2 = st.columns([1, 1])